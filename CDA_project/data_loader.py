@@ -2,6 +2,15 @@ import requests
 import time
 import datetime
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+    try:
+        import ujson as json
+    except ImportError:
+        import json
+
 # URL to query
 url = "https://valencia.opendatasoft.com/api/explore/v2.1/catalog/datasets/valenbisi-disponibilitat-valenbisi-dsiponibilidad/records?select=address%2C%20number%2C%20available%2C%20free%2C%20total%2C%20geo_point_2d%2Cupdated_at&where=update_jcd%3A%20%5B%272025%2F11%2F12%27%20TO%20%272025%2F12%2F13%27%5D&order_by=number&limit=-1"
 
@@ -18,9 +27,12 @@ while time.time() < end_time:
         data = response.json()
         # Save to a file with timestamp
         filename = now.strftime("valenbisi_%Y%m%d_%H%M.json")
-        with open(filename, "w", encoding="utf-8") as f:
-            import json
-            json.dump(data, f, ensure_ascii=False, indent=2)
+        if orjson is not None:
+            with open(filename, "wb") as f:
+                f.write(orjson.dumps(data, option=orjson.OPT_INDENT_2))
+        else:
+            with open(filename, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False, indent=2)
         print(f"Data saved to {filename}")
     except Exception as e:
         print(f"Failed to get data: {e}")
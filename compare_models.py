@@ -2,6 +2,12 @@
 import pandas as pd
 import matplotlib.pyplot as plt
 import numpy as np
+import os
+
+try:
+    import polars as pl
+except ImportError:
+    pl = None
 
 # Set style for presentation
 plt.rcParams['figure.figsize'] = (10, 6)
@@ -12,26 +18,52 @@ plt.rcParams['xtick.labelsize'] = 12
 plt.rcParams['ytick.labelsize'] = 12
 plt.rcParams['legend.fontsize'] = 12
 
-# Load error data
-print("Loading error data...")
-nn_errors = pd.read_csv('nn_errors.csv')
-rf_errors = pd.read_csv('rf_errors.csv')
+# Only the metric columns are used by the plots below
+METRIC_COLUMNS = ['mae', 'rmse', 'r2']
+
+
+def load_cached(csv_path):
+    """Load metric columns from csv_path, reusing a Parquet copy when it is up to date."""
+    pq_path = os.path.splitext(csv_path)[0] + '.parquet'
+    if os.path.exists(pq_path) and os.path.getmtime(pq_path) >= os.path.getmtime(csv_path):
+        return pd.read_parquet(pq_path)
+    df = pd.read_csv(csv_path, usecols=lambda col: col in METRIC_COLUMNS)
+    df.to_parquet(pq_path, index=False)
+    return df
+
+
+def summarize(means):
+    return {
+        'MAE': means['mae'],
+        'RMSE': means['rmse'],
+        'R²': means.get('r2')
+    }
+
+
+def load_errors(csv_path):
+    """Return (summary statistics, MAE values) for one model's error file."""
+    if pl is not None:
+        # Lazy scan: the column projection and all means run in one multithreaded pass
+        lf = pl.scan_csv(csv_path)
+        cols = [col for col in METRIC_COLUMNS if col in lf.collect_schema().names()]
+        lf = lf.select(cols)
+        means = lf.select([pl.col(col).mean() for col in cols]).collect().to_dicts()[0]
+        mae = lf.select(pl.col('mae').drop_nulls()).collect().to_series().to_numpy()
+    else:
+        errors = load_cached(csv_path)
+        # One pass over all metric columns
+        means = errors[[col for col in METRIC_COLUMNS if col in errors.columns]].mean(numeric_only=True)
+        mae = errors['mae'].dropna().to_numpy()
+    return summarize(means), mae
 
-print(f"Neural Network errors shape: {nn_errors.shape}")
-print(f"Random Forest errors shape: {rf_errors.shape}")
 
-# Calculate summary statistics
-nn_stats = {
-    'MAE': nn_errors['mae'].mean(),
-    'RMSE': nn_errors['rmse'].mean(),
-    'R²': nn_errors['r2'].mean() if 'r2' in nn_errors.columns else None
-}
+# Load error data
+print("Loading error data...")
+nn_stats, nn_mae = load_errors('nn_errors.csv')
+rf_stats, rf_mae = load_errors('rf_errors.csv')
 
-rf_stats = {
-    'MAE': rf_errors['mae'].mean(),
-    'RMSE': rf_errors['rmse'].mean(),
-    'R²': rf_errors['r2'].mean() if 'r2' in rf_errors.columns else None
-}
+print(f"Neural Network errors: {len(nn_mae)} stations")
+print(f"Random Forest errors: {len(rf_mae)} stations")
 
 print("\n" + "="*60)
 print("SUMMARY STATISTICS")
@@ -85,10 +117,14 @@ plt.close()
 
 # Plot 2: MAE Distribution Comparison
 fig2, ax2 = plt.subplots(figsize=(10, 6))
-ax2.hist(nn_errors['mae'], bins=40, alpha=0.7, label='Neural Network', 
-         color='#2E86AB', edgecolor='black', linewidth=1)
-ax2.hist(rf_errors['mae'], bins=40, alpha=0.7, label='Random Forest', 
-         color='#A23B72', edgecolor='black', linewidth=1)
+# Bin both series once on shared edges, then draw the precomputed counts
+edges = np.linspace(min(nn_mae.min(), rf_mae.min()), max(nn_mae.max(), rf_mae.max()), 41)
+nn_hist, _ = np.histogram(nn_mae, bins=edges)
+rf_hist, _ = np.histogram(rf_mae, bins=edges)
+ax2.stairs(nn_hist, edges, fill=True, alpha=0.7, label='Neural Network', 
+           color='#2E86AB', edgecolor='black', linewidth=1)
+ax2.stairs(rf_hist, edges, fill=True, alpha=0.7, label='Random Forest', 
+           color='#A23B72', edgecolor='black', linewidth=1)
 ax2.set_xlabel('Mean Absolute Error (MAE)', fontweight='bold')
 ax2.set_ylabel('Frequency', fontweight='bold')
 ax2.set_title('Error Distribution Comparison', fontweight='bold', pad=20)
@@ -100,14 +136,31 @@ print(f"✓ Saved 'comparison_distribution.png'")
 plt.close()
 
 # Plot 3: Box Plot Comparison
+def box_stats(values, label):
+    # Same statistics ax.boxplot derives (1.5 IQR whiskers), via linear-time percentiles
+    q1, med, q3 = np.percentile(values, [25, 50, 75])
+    iqr = q3 - q1
+    inside = values[(values >= q1 - 1.5 * iqr) & (values <= q3 + 1.5 * iqr)]
+    whislo, whishi = inside.min(), inside.max()
+    return {
+        'label': label,
+        'med': med,
+        'q1': q1,
+        'q3': q3,
+        'whislo': whislo,
+        'whishi': whishi,
+        'fliers': values[(values < whislo) | (values > whishi)]
+    }
+
+
 fig3, ax3 = plt.subplots(figsize=(10, 6))
-data_to_plot = [nn_errors['mae'], rf_errors['mae']]
-bp = ax3.boxplot(data_to_plot, labels=['Neural Network', 'Random Forest'],
-                 patch_artist=True, widths=0.6,
-                 medianprops=dict(color='red', linewidth=2),
-                 boxprops=dict(facecolor='lightblue', edgecolor='black', linewidth=1.5),
-                 whiskerprops=dict(color='black', linewidth=1.5),
-                 capprops=dict(color='black', linewidth=1.5))
+stats_to_plot = [box_stats(nn_mae, 'Neural Network'), box_stats(rf_mae, 'Random Forest')]
+bp = ax3.bxp(stats_to_plot,
+             patch_artist=True, widths=0.6,
+             medianprops=dict(color='red', linewidth=2),
+             boxprops=dict(facecolor='lightblue', edgecolor='black', linewidth=1.5),
+             whiskerprops=dict(color='black', linewidth=1.5),
+             capprops=dict(color='black', linewidth=1.5))
 
 # Color the boxes differently
 colors = ['#2E86AB', '#A23B72']
@@ -116,8 +169,8 @@ for patch, color in zip(bp['boxes'], colors):
     patch.set_alpha(0.7)
 
 # Add labels for the bottom whisker (minimum values - best case)
-min_nn = nn_errors['mae'].min()
-min_rf = rf_errors['mae'].min()
+min_nn = nn_mae.min()
+min_rf = rf_mae.min()
 ax3.text(1, min_nn, f'Min: {min_nn:.4f}', ha='center', va='top', 
          fontweight='bold', fontsize=10, bbox=dict(boxstyle='round,pad=0.3', 
          facecolor='#2E86AB', alpha=0.7, edgecolor='black'))
@@ -1,103 +1,183 @@
-import json
+import numpy as np
 import pandas as pd
 import argparse
 import os
-
-def aggregate_data(input_files, output_file):
-    # Aggregate JSON data into pandas dataframe
-    aggregated_data = []
-
-    for file_path in input_files:
-        with open(file_path, 'r') as file:
-            data = json.load(file)
-            # Extract updated_at from filename
-            file_name = os.path.basename(file_path)
-            # Assuming filename format contains timestamp (e.g., data_2024-01-15.json)
-            # Adjust the extraction logic based on your actual filename format
-            updated_at = make_date_string(file_name.replace('.json', '').split('_')[-2:])
-            
-            for record in data['results']:
-                record['updated_at'] = updated_at
-            
-            aggregated_data.extend(data['results'])
-    
-    print(f"Total records aggregated: {len(aggregated_data)}")
-    print(f"Sample record: {aggregated_data[1] if aggregated_data else 'No data found'}")
-    df = pd.json_normalize(aggregated_data)
-    df.to_csv(output_file, index=False)
+import gzip
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    from orjson import loads as json_loads
+except ImportError:
+    try:
+        from ujson import loads as json_loads
+    except ImportError:
+        from json import loads as json_loads
+
+try:
+    import pyarrow as pa
+    import pyarrow.json as pa_json
+except ImportError:
+    pa = None
+
+# Snapshots written by data_loader are gzipped NDJSON (one record per line);
+# older ones are a single JSON document with a 'results' list
+NDJSON_SUFFIXES = ('.ndjson.gz', '.ndjson')
+SNAPSHOT_SUFFIXES = NDJSON_SUFFIXES + ('.json.gz', '.json')
+
+# Snapshot fields kept after loading; everything else the API returns is dropped
+KEEP_COLUMNS = ('number', 'available', 'free', 'total', 'updated_at')
+
+WEEKDAYS = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+
+def _table_to_frame(table, columns=None):
+    # flatten() names nested fields the same way json_normalize does (e.g. geo_point_2d.lon)
+    table = table.flatten()
+    if columns is not None:
+        table = table.select([col for col in columns if col in table.column_names])
+    # self_destruct frees each Arrow column as soon as pandas has taken it
+    return table.to_pandas(split_blocks=True, self_destruct=True)
+
+def records_to_frame(records, columns=None):
+    # Arrow builds the columns in C instead of walking every record dict.
+    # pa.array infers the struct type from the keys of all records (from_pylist
+    # would only look at the first one and drop keys it lacks)
+    if pa is None or not records:
+        frame = pd.json_normalize(records)
+        return frame if columns is None else frame.filter(items=columns)
+    return _table_to_frame(pa.Table.from_struct_array(pa.array(records)), columns)
+
+def _read_records(file_path, ndjson):
+    opener = gzip.open if file_path.endswith('.gz') else open
+    with opener(file_path, 'rb') as file:
+        if ndjson:
+            return [json_loads(line) for line in file if line.strip()]
+        return json_loads(file.read())['results']
+
+def _load_one(file_path):
+    file_name = os.path.basename(file_path)
+    ndjson = file_name.endswith(NDJSON_SUFFIXES)
+    frame = None
+    if ndjson and pa is not None:
+        # pyarrow parses NDJSON (gzip included) straight into columns
+        try:
+            frame = _table_to_frame(pa_json.read_json(file_path), KEEP_COLUMNS)
+        except pa.ArrowInvalid:
+            # data_loader writes an empty file when the API returned no
+            # results, which pyarrow refuses; read it record by record instead
+            frame = None
+    if frame is None:
+        frame = records_to_frame(_read_records(file_path, ndjson), columns=KEEP_COLUMNS)
+
+    # Extract updated_at from filename
+    for suffix in SNAPSHOT_SUFFIXES:
+        if file_name.endswith(suffix):
+            file_name = file_name[:-len(suffix)]
+            break
+    # Assuming filename format contains timestamp (e.g., valenbisi_20251112_2046.json)
+    # Adjust the extraction logic based on your actual filename format
+    frame['updated_at'] = parse_file_timestamp(file_name.split('_')[-2:])
+    return frame
+
+def aggregate_data(input_files, output_file, fmt='parquet', max_workers=8):
+    # Aggregate JSON data into pandas dataframe, one frame per snapshot file.
+    # File reads release the GIL, so snapshots are loaded on a thread pool.
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        frames = list(executor.map(_load_one, input_files))
+
+    # Snapshots with no results are 0-row frames holding only updated_at; they add
+    # nothing, and concatenating them would upcast the int columns to float
+    frames = [frame for frame in frames if len(frame)]
+    df = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+    print(f"Total records aggregated: {len(df)}")
+    print(f"Sample record: {df.iloc[1].to_dict() if len(df) > 1 else 'No data found'}")
+    write_frame(df, output_file, fmt)
 
     return df
 
-def make_date_string(strings):
+def write_frame(df, output_file, fmt='parquet'):
+    # Parquet keeps dtypes and is much smaller/faster to read back than CSV
+    if fmt == 'parquet':
+        output_file = os.path.splitext(output_file)[0] + '.parquet'
+        df.to_parquet(output_file, engine='pyarrow', compression='zstd', index=False)
+    else:
+        df.to_csv(output_file, index=False)
+    print(f"Data written to {output_file}")
+    return output_file
+
+def parse_file_timestamp(strings):
+    # Parse the YYYYMMDD_HHMM filename tokens straight to datetime64 so the
+    # column never has to be re-parsed from text later on
     if len(strings) != 2:
-        return ""
-    return f'{strings[0][:4]}-{strings[0][4:6]}-{strings[0][6:]} {strings[1][0:2]}:{strings[1][2:4]}'
+        return np.datetime64('NaT', 'ns')
+    try:
+        return np.datetime64(datetime.strptime('_'.join(strings), '%Y%m%d_%H%M'), 'ns')
+    except ValueError:
+        return np.datetime64('NaT', 'ns')
 
 def get_json_files(input_dir):
-    import os
-    json_files = []
-    for file_name in os.listdir(input_dir):
-        if file_name.endswith('.json'):
-            json_files.append(os.path.join(input_dir, file_name))
-    return json_files
+    # DirEntry objects carry the full path and cached type info
+    with os.scandir(input_dir) as entries:
+        return [entry.path for entry in entries if entry.is_file() and entry.name.endswith(SNAPSHOT_SUFFIXES)]
 
 def check_missing_values(df):
     missing_values = df.isnull().sum()
     print("Missing values in each column:")
     print(missing_values)
 
-def add_weekday_column(df):
-    if 'updated_at' in df.columns:
-        df['updated_at'] = pd.to_datetime(df['updated_at'], errors='coerce')
-        df['weekday'] = df['updated_at'].dt.day_name()
-    else:
-        print("No 'updated_at' column found to add 'weekday'.")
-    return df
-
-def add_weekend_column(df):
-    if 'updated_at' in df.columns:
-        df['is_weekend'] = df['updated_at'].dt.dayofweek >= 5
-    else:
-        print("No 'updated_at' column found to add 'is_weekend'.")
+def add_time_features(df):
+    # Derive weekday, is_weekend and time from a single parse of updated_at
+    if 'updated_at' not in df.columns:
+        print("No 'updated_at' column found to add time features.")
+        return df
+    dt = df['updated_at']
+    if not pd.api.types.is_datetime64_any_dtype(dt):
+        # Only needed for frames read back from text files
+        dt = pd.to_datetime(dt, format='ISO8601', errors='coerce', cache=True)
+    # Unparseable timestamps map to code -1, i.e. a missing category
+    dow = dt.dt.dayofweek.fillna(-1).to_numpy(dtype='int8')
+    df['updated_at'] = dt
+    # int8 category codes instead of one Python string per row
+    df['weekday'] = pd.Categorical.from_codes(dow, categories=WEEKDAYS, ordered=True)
+    df['is_weekend'] = np.asarray(dow >= 5, dtype=bool)
+    df['time'] = dt.dt.time
     return df
 
 def add_ratio_column(df):
-    df['available_to_total_ratio'] = df.apply(
-        lambda row: row['available'] / row['total'] if row['total'] > 0 else None, axis=1
+    total = df['total'].to_numpy(dtype=float)
+    available = df['available'].to_numpy(dtype=float)
+    # Stations with no docks get NaN instead of a division by zero
+    df['available_to_total_ratio'] = np.divide(
+        available, total, out=np.full_like(total, np.nan), where=total > 0
     )
     return df
 
-def add_time_column(df):
-    if 'updated_at' in df.columns:
-        df['time'] = df['updated_at'].dt.time
-    else:
-        print("No 'updated_at' column found to add 'time'.")
-    return df
-
 if __name__ == "__main__":
-    parser = argparse.ArgumentParser(description="Aggregate JSON data files into a single CSV file.")
+    parser = argparse.ArgumentParser(description="Aggregate JSON data files into a single Parquet or CSV file.")
     parser.add_argument('--input-dir', help='Directory containing input JSON files to aggregate.')
-    parser.add_argument('--output-file', default='aggregated_data.csv', help='Output CSV file path.')
+    parser.add_argument('--output-file', help='Output file path (extension is replaced to match --format; default aggregated_data.<format>).')
+    parser.add_argument('--format', choices=['parquet', 'csv'], default='parquet', help='Output file format.')
     parser.add_argument('--address-df', required=False, help='Path to address dataframe CSV file.')
     parser.add_argument('--raw-only', action='store_true', help='If set, only generate raw aggregated data without additional processing.')
     args = parser.parse_args()
+    if args.output_file is None:
+        args.output_file = f'aggregated_data.{args.format}'
 
     input_files = get_json_files(args.input_dir)
 
-    df = aggregate_data(input_files, f'raw_{args.output_file}')
+    df = aggregate_data(input_files, f'raw_{args.output_file}', args.format)
 
     check_missing_values(df)
     if not args.raw_only:
         if args.address_df:
             address_df = pd.read_csv(args.address_df)
-            df = df.merge(address_df, on='number', how='left', suffixes=('_old', ''))
-            df = df.drop(columns=[col for col in df.columns if col.endswith('_old')])
+            # Only bring in columns the snapshots don't already have
+            new_cols = [col for col in address_df.columns if col == 'number' or col not in df.columns]
+            df = df.merge(address_df[new_cols], on='number', how='left')
 
-        df = add_weekday_column(df)
-        df = add_weekend_column(df)
+        df = add_time_features(df)
         df = add_ratio_column(df)
-        df = add_time_column(df)
 
         check_missing_values(df)
 
-        df.to_csv(args.output_file, index=False)
\ No newline at end of file
+        write_frame(df, args.output_file, args.format)
\ No newline at end of file
@@ -1,10 +1,41 @@
 import requests
 import time
 import datetime
+import gzip
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+    try:
+        import ujson as json
+    except ImportError:
+        import json
 
 # URL to query
 url = "https://valencia.opendatasoft.com/api/explore/v2.1/catalog/datasets/valenbisi-disponibilitat-valenbisi-dsiponibilidad/records?select=number%2C%20available%2C%20free%2C%20total%2Cupdated_at&where=update_jcd%3A%20%5B%272025%2F11%2F12%27%20TO%20%272025%2F12%2F13%27%5D&order_by=number&limit=-1"
 
+# Reuse one connection pool for every request instead of a new TCP+TLS handshake each time
+session = requests.Session()
+session.headers.update({'Accept-Encoding': 'gzip'})
+
+
+def fetch_page(page_url):
+    page_response = session.get(page_url)
+    page_response.raise_for_status()
+    return page_response.json()['results']
+
+
+def write_records(f, records):
+    # One JSON record per line (NDJSON), so pages can be appended as they arrive
+    if orjson is not None:
+        f.write(b"".join(orjson.dumps(record) + b"\n" for record in records))
+    else:
+        f.write("".join(json.dumps(record, ensure_ascii=False) + "\n" for record in records).encode("utf-8"))
+
+
 # Calculate end time (7 days from start)
 start_time = time.time()
 end_time = start_time + 7 * 24 * 60 * 60  # 7 days in seconds
@@ -13,21 +44,30 @@ while time.time() < end_time:
     now = datetime.datetime.now()
     # Get the JSON data from the URL
     try:
-        response = requests.get(url)
+        response = session.get(url)
         response.raise_for_status()
         data = response.json()
-        if data['total_count'] > len(data['results']):
-            for offset in range(100, data['total_count'], 100):
-                paged_url = url + f"&offset={offset}"
-                paged_response = requests.get(paged_url)
-                paged_response.raise_for_status()
-                paged_data = paged_response.json()
-                data['results'].extend(paged_data['results'])
-        # Save to a file with timestamp
-        filename = now.strftime("valenbisi_%Y%m%d_%H%M.json")
-        with open(filename, "w", encoding="utf-8") as f:
-            import json
-            json.dump(data, f, ensure_ascii=False, indent=2)
+        # Save to a file with timestamp, streaming each page straight to disk
+        filename = now.strftime("valenbisi_%Y%m%d_%H%M.ndjson.gz")
+        # Write to a temp file and rename, so the aggregator never sees a partial snapshot
+        tmp_filename = filename + ".tmp"
+        try:
+            with gzip.open(tmp_filename, "wb", compresslevel=1) as f:
+                write_records(f, data['results'])
+                if data['total_count'] > len(data['results']):
+                    paged_urls = [url + f"&offset={offset}" for offset in range(100, data['total_count'], 100)]
+                    # A few pages in flight at once, without hammering the server
+                    with ThreadPoolExecutor(max_workers=4) as executor:
+                        for results in executor.map(fetch_page, paged_urls):
+                            write_records(f, results)
+        except Exception:
+            # A failed page fetch must not leave a partial .tmp snapshot behind
+            try:
+                os.remove(tmp_filename)
+            except OSError:
+                pass
+            raise
+        os.replace(tmp_filename, filename)
         print(f"Data saved to {filename}")
     except Exception as e:
         print(f"Failed to get data: {e}")
@@ -28,16 +28,66 @@ class GRUModel(nn.Module):
         return self.fc(last)
 
 
-def load_model(model_path='gru_bike_prediction_model.pt', device='cpu'):
-    """Load the trained GRU model."""
+def bf16_supported():
+    """Whether this CPU has native bfloat16 instructions (AVX-512 BF16)."""
+    check = getattr(torch.cpu, '_is_avx512_bf16_supported', None)
+    return bool(check is not None and check())
+
+
+class Float32Input(nn.Module):
+    """Run a layer in float32 and hand its output on in bfloat16."""
+    def __init__(self, layer):
+        super().__init__()
+        self.layer = layer.float()
+
+    def forward(self, x):
+        return self.layer(x.float()).to(torch.bfloat16)
+
+
+def load_model(model_path='gru_bike_prediction_model.pt', device='cpu', use_bf16=None, quantize=False):
+    """
+    Load the trained GRU model for CPU inference.
+    
+    Uses bfloat16 when the CPU supports it natively, float32 otherwise.
+    quantize=True dynamically quantizes the GRU layer to int8 instead (float32
+    elsewhere); on agg.csv that moves predicted ratios by up to 0.023 (mean 0.004)
+    from float32. The Linear layers are left alone: quantizing them shifts
+    predictions by up to 0.46, since the first one mixes lat/lon (~39, ~-0.4)
+    with [0, 1] features under a single activation scale.
+    """
     # The model expects 7 features: ratio, lon, lat, hour_sin, hour_cos, weekday_num, is_weekend
     model = GRUModel(input_dim=7, feature_dim=256, hidden_dim=256, output_len=144)
     model.load_state_dict(torch.load(model_path, map_location=device))
-    model.to(device)
+    if quantize:
+        # Dynamic quantization needs float32 weights
+        use_bf16 = False
+    elif use_bf16 is None:
+        use_bf16 = torch.device(device).type == 'cpu' and bf16_supported()
+    dtype = torch.bfloat16 if use_bf16 else torch.float32
+    model.to(device, dtype=dtype)
+    if use_bf16:
+        # bf16 steps are 0.25 around lat 39.5, which would collapse every station's
+        # latitude to one value; the first Linear reads the raw features in float32.
+        # The rest of the model in bf16 moves outputs by up to ~0.017 from float32.
+        model.features[0] = Float32Input(model.features[0])
     model.eval()
+    
+    if quantize:
+        if 'fbgemm' in torch.backends.quantized.supported_engines:
+            torch.backends.quantized.engine = 'fbgemm'
+        model = torch.ao.quantization.quantize_dynamic(model, {nn.GRU}, dtype=torch.qint8)
+    
     return model
 
 
+def run_model(model, X):
+    """Run a forward pass on float32 inputs and return the outputs as a float32 NumPy array."""
+    # Inputs stay float32 on every path; a bf16 model converts after its first layer
+    X = X.float()
+    with torch.inference_mode():
+        return model(X).float().cpu().numpy()
+
+
 def prepare_features(df_row, future_time):
     """Prepare features for prediction at a given future time."""
     # Extract time features
@@ -60,96 +110,111 @@ def prepare_features(df_row, future_time):
     ], dtype=np.float32)
 
 
-def predict_station(model, df_station, prediction_hours=24, seq_len=24, device='cpu'):
+def build_station_window(df_station, seq_len=24):
     """
-    Predict bike availability for a station at future time points.
+    Build the model input window for one station.
     
     Args:
-        model: Trained GRU model
-        df_station: DataFrame with historical data for one station (sorted by time)
-        prediction_hours: Number of hours into the future to predict
+        df_station: DataFrame with historical data for one station (sorted by time,
+            updated_at already parsed to datetime64)
         seq_len: Sequence length used during training
-        device: Device to run predictions on
         
     Returns:
-        Dictionary with predictions for each hour
+        Tuple of (float32 array of shape (seq_len, 7), last timestamp, total bikes)
     """
-    # Get the last seq_len records as context
-    if len(df_station) < seq_len:
-        # Pad with the first row if we don't have enough data
-        needed = seq_len - len(df_station)
-        padding = pd.DataFrame([df_station.iloc[0].to_dict()] * needed)
-        df_station = pd.concat([padding, df_station], ignore_index=True)
-    
-    df_hist = df_station.tail(seq_len).copy()
-    
-    # Get the last timestamp
-    last_time = pd.to_datetime(df_hist.iloc[-1]['updated_at'])
-    
-    # Prepare input sequence
-    features = ["ratio", "geo_point_2d.lon", "geo_point_2d.lat", "hour_sin", "hour_cos", "weekday_num", "is_weekend"]
-    
-    # Calculate time features for historical data
-    for idx in df_hist.index:
-        time = pd.to_datetime(df_hist.loc[idx, 'updated_at'])
-        hour = time.hour
-        df_hist.loc[idx, 'hour_sin'] = np.sin(2 * np.pi * hour / 24)
-        df_hist.loc[idx, 'hour_cos'] = np.cos(2 * np.pi * hour / 24)
-        df_hist.loc[idx, 'weekday_num'] = float(time.weekday())
-        df_hist.loc[idx, 'is_weekend'] = 1.0 if time.weekday() >= 5 else 0.0
-    
-    # Rename ratio column if needed
-    if 'available_to_total_ratio' in df_hist.columns:
-        df_hist['ratio'] = df_hist['available_to_total_ratio']
-    
-    # Ensure all columns are numeric and handle any remaining object types
-    for col in features:
-        df_hist[col] = pd.to_numeric(df_hist[col], errors='coerce')
+    # Row positions of the last seq_len records; short histories repeat the first row
+    n = len(df_station)
+    rows = np.maximum(np.arange(n - seq_len, n), 0)
     
-    # Fill any NaN values with 0
-    df_hist[features] = df_hist[features].fillna(0)
+    # updated_at is already datetime64 (parsed once for the whole file by the caller)
+    times = df_station['updated_at']
+    last_time = times.iloc[-1]
+    if times.dt.tz is not None:
+        # Time features use the local wall-clock time
+        times = times.dt.tz_localize(None)
+    stamps = times.to_numpy()[rows]
+    
+    # Hour of day and weekday (Monday=0) straight from the datetime64 values;
+    # 1970-01-01 was a Thursday
+    hours = stamps.astype('datetime64[h]').astype(np.int64) % 24
+    weekdays = (stamps.astype('datetime64[D]').astype(np.int64) + 3) % 7
+    
+    # Use the aggregated ratio column when present
+    ratio_col = 'available_to_total_ratio' if 'available_to_total_ratio' in df_station.columns else 'ratio'
     
-    # Get feature values and convert to float32
-    X_window = df_hist[features].values.astype(np.float32)
-    X_window = torch.tensor(X_window, dtype=torch.float32).unsqueeze(0)
-    X_window = X_window.to(device)
+    # Features in the order the model was trained on:
+    # ratio, lon, lat, hour_sin, hour_cos, weekday_num, is_weekend
+    X_window = np.empty((seq_len, 7), dtype=np.float32)
+    for i, col in enumerate((ratio_col, 'geo_point_2d.lon', 'geo_point_2d.lat')):
+        X_window[:, i] = pd.to_numeric(df_station[col], errors='coerce').to_numpy(dtype=np.float32, na_value=np.nan)[rows]
+    X_window[:, 3] = np.sin(2 * np.pi * hours / 24)
+    X_window[:, 4] = np.cos(2 * np.pi * hours / 24)
+    X_window[:, 5] = weekdays
+    X_window[:, 6] = weekdays >= 5
+    
+    # Fill any NaN values with 0
+    X_window[np.isnan(X_window)] = 0
     
     # Get total bikes (convert to numeric safely)
-    last_row = df_hist.iloc[-1]
-    total_bikes = pd.to_numeric(last_row.get('total', 0), errors='coerce')
+    total_bikes = pd.to_numeric(df_station['total'].iloc[-1], errors='coerce') if 'total' in df_station.columns else 0
     if pd.isna(total_bikes):
         total_bikes = 0
     
+    return X_window, last_time, total_bikes
+
+
+def format_predictions(pred_ratios, last_time, total_bikes, prediction_hours=24):
+    """Turn one station's 144 model outputs into hourly prediction dicts."""
     predictions = []
     
-    model.eval()
-    with torch.no_grad():
-        # Model outputs 144 predictions (one every 10 minutes for 24 hours)
-        pred_ratios = model(X_window).cpu().numpy().flatten()
-        
-        # Extract hourly predictions (every 6th prediction since 6*10min = 1 hour)
-        # Predictions at indices: 5, 11, 17, 23, ... (0-indexed, so +1h is at index 5)
-        max_hours = min(int(prediction_hours), 24)
-        for hour in range(1, max_hours + 1):
-            # Index for this hour: (hour * 6) - 1 (since we want the prediction AT that hour)
-            idx = (hour * 6) - 1
-            if idx >= len(pred_ratios):
-                break
-                
-            future_time = last_time + timedelta(hours=hour)
-            pred_ratio = float(pred_ratios[idx])
+    # Extract hourly predictions (every 6th prediction since 6*10min = 1 hour)
+    # Predictions at indices: 5, 11, 17, 23, ... (0-indexed, so +1h is at index 5)
+    max_hours = min(int(prediction_hours), 24)
+    for hour in range(1, max_hours + 1):
+        # Index for this hour: (hour * 6) - 1 (since we want the prediction AT that hour)
+        idx = (hour * 6) - 1
+        if idx >= len(pred_ratios):
+            break
             
-            predictions.append({
-                'hour': hour,
-                'time': future_time.strftime('%Y-%m-%d %H:%M'),
-                'time_label': future_time.strftime('%H:%M'),
-                'predicted_ratio': pred_ratio,
-                'predicted_bikes': int(pred_ratio * total_bikes) if total_bikes > 0 else None
-            })
+        future_time = last_time + timedelta(hours=hour)
+        pred_ratio = float(pred_ratios[idx])
+        
+        predictions.append({
+            'hour': hour,
+            'time': future_time.strftime('%Y-%m-%d %H:%M'),
+            'time_label': future_time.strftime('%H:%M'),
+            'predicted_ratio': pred_ratio,
+            'predicted_bikes': int(pred_ratio * total_bikes) if total_bikes > 0 else None
+        })
     
     return predictions
 
 
+def predict_station(model, df_station, prediction_hours=24, seq_len=24, device='cpu'):
+    """
+    Predict bike availability for a station at future time points.
+    
+    Args:
+        model: Trained GRU model
+        df_station: DataFrame with historical data for one station (sorted by time,
+            updated_at already parsed to datetime64)
+        prediction_hours: Number of hours into the future to predict
+        seq_len: Sequence length used during training
+        device: Device to run predictions on
+        
+    Returns:
+        Dictionary with predictions for each hour
+    """
+    X_window, last_time, total_bikes = build_station_window(df_station, seq_len)
+    X_window = torch.from_numpy(X_window).unsqueeze(0).to(device)
+    
+    model.eval()
+    # Model outputs 144 predictions (one every 10 minutes for 24 hours)
+    pred_ratios = run_model(model, X_window).flatten()
+    
+    return format_predictions(pred_ratios, last_time, total_bikes, prediction_hours)
+
+
 def get_predictions_for_all_stations(agg_csv_path='agg.csv', model_path='gru_bike_prediction_model.pt', 
                                      prediction_hours=24, seq_len=24):
     """
@@ -169,24 +234,45 @@ def get_predictions_for_all_stations(agg_csv_path='agg.csv', model_path='gru_bik
     
     # Load aggregated data
     try:
-        df = pd.read_csv(agg_csv_path)
+        if agg_csv_path.endswith('.parquet'):
+            df = pd.read_parquet(agg_csv_path)
+        else:
+            try:
+                # Multithreaded Arrow parser when pyarrow is installed
+                df = pd.read_csv(agg_csv_path, engine='pyarrow')
+            except ImportError:
+                df = pd.read_csv(agg_csv_path)
         df['updated_at'] = pd.to_datetime(df['updated_at'])
         df = df.sort_values(['number', 'updated_at'])
     except Exception as e:
         print(f"Error loading data: {e}")
         return {}
     
-    # Get predictions for each station
+    # Build every station's input window, then run the model once on the whole batch
     all_predictions = {}
+    windows = []
+    batch_info = []
     
-    for station_num in df['number'].unique():
-        df_station = df[df['number'] == station_num].copy()
-        
+    # Only the last seq_len rows of each station feed the model; trim them all in one pass
+    df = df.groupby('number', sort=False).tail(seq_len)
+    for station_num, df_station in df.groupby('number', sort=False):
         try:
-            predictions = predict_station(model, df_station, prediction_hours, seq_len, device)
-            all_predictions[int(station_num)] = predictions
+            X_window, last_time, total_bikes = build_station_window(df_station, seq_len)
         except Exception as e:
             print(f"Error predicting station {station_num}: {e}")
             all_predictions[int(station_num)] = []
+            continue
+        windows.append(X_window)
+        batch_info.append((int(station_num), last_time, total_bikes))
+    
+    if not windows:
+        return all_predictions
+    
+    X = torch.from_numpy(np.stack(windows)).to(device)
+    # Model outputs 144 predictions per station (one every 10 minutes for 24 hours)
+    pred_ratios = run_model(model, X)
+    
+    for i, (station_num, last_time, total_bikes) in enumerate(batch_info):
+        all_predictions[station_num] = format_predictions(pred_ratios[i], last_time, total_bikes, prediction_hours)
     
     return all_predictions